@@ -0,0 +1,148 @@
+"""Measures backend throughput with 1, 2 and 4 gunicorn workers.
+
+Usage (from the repository root):
+    python benchmarks/worker_scaling.py --workers 1 2 4 --duration 20
+
+Each worker count gets a fresh gunicorn process started with gunicorn.conf.py
+(preloaded app), running against a private copy of chroma_db and an empty
+shared cache. Requests are fired concurrently for `--duration` seconds.
+
+Workloads:
+  retrieve         /retrieve with a unique query per request: embedding with
+                   the preloaded model, Chroma search + MMR and shared-cache
+                   writes. No LLM call. (default)
+  retrieve-cached  /retrieve cycling over a few queries, so after warm-up
+                   requests are served from the shared SQLite cache.
+  validate         /validate-scripts (CPU-bound static analysis).
+  chat             /chat; dominated by the Gemini round-trip (or the mock
+                   fallback when no key is set).
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(workers: int, port: int, state_dir: str) -> subprocess.Popen:
+    chroma_dir = os.path.join(state_dir, "chroma_db")
+    shutil.copytree(os.path.join(ROOT, "chroma_db"), chroma_dir)
+    env = dict(
+        os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port),
+        CHROMA_DB_DIR=chroma_dir, SHARED_CACHE_PATH=os.path.join(state_dir, "shared_cache.sqlite3")
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "src.backend:app", "-c", "gunicorn.conf.py"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    pids = set()
+    deadline = time.time() + 180
+    # Wait until every worker has answered at least once
+    while time.time() < deadline and len(pids) < workers:
+        try:
+            pids.add(requests.get(f"{base_url}/health", timeout=1).json()["pid"])
+        except requests.exceptions.RequestException:
+            time.sleep(0.5)
+    if len(pids) < workers:
+        proc.terminate()
+        raise RuntimeError(f"Backend with {workers} worker(s) did not come up")
+    return proc
+
+
+def make_payloads(workload: str):
+    if workload == "validate":
+        with open(os.path.join(ROOT, "temp_test_script.py")) as f:
+            script = f.read()
+        with open(os.path.join(ROOT, "checkout.html")) as f:
+            html = f.read()
+        payload = {"scripts": [script] * 3, "html_content": html}
+        return "/validate-scripts", lambda i: payload
+    if workload == "retrieve":
+        return "/retrieve", lambda i: {"query": f"What are the rules for discount codes? (variant {i})"}
+    if workload == "retrieve-cached":
+        return "/retrieve", lambda i: {"query": f"What are the rules for discount codes? (variant {i % 8})"}
+    return "/chat", lambda i: {"query": f"What are the rules for discount codes? (variant {i})"}
+
+
+def run_load(base_url: str, workload: str, concurrency: int, duration: float) -> dict:
+    endpoint, make_payload = make_payloads(workload)
+    counter = itertools.count()
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_maxsize=concurrency))
+    latencies = []
+    errors = []
+    deadline = time.time() + duration
+
+    def worker():
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.post(f"{base_url}{endpoint}", json=make_payload(next(counter)), timeout=120)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except requests.exceptions.RequestException:
+                errors.append(endpoint)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.time() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--workload", choices=["retrieve", "retrieve-cached", "validate", "chat"], default="retrieve")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+
+    results = {}
+    for workers in args.workers:
+        port = free_port()
+        with tempfile.TemporaryDirectory() as state_dir:
+            proc = start_backend(workers, port, state_dir)
+            try:
+                results[workers] = run_load(f"http://127.0.0.1:{port}", args.workload, args.concurrency, args.duration)
+            finally:
+                proc.terminate()
+                proc.wait()
+        print(f"{workers} worker(s): {json.dumps(results[workers])}")
+
+    baseline = results[args.workers[0]]["throughput_rps"] or 1
+    print(f"\nworkload={args.workload} concurrency={args.concurrency} duration={args.duration}s cpus={os.cpu_count()}")
+    print("workers  req/s    speedup")
+    for workers, result in results.items():
+        print(f"{workers:>7}  {result['throughput_rps']:>7.1f}  {result['throughput_rps'] / baseline:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import os
+
+# Multi-worker deployment of the FastAPI backend.
+# `preload_app` imports src.backend (and loads the embedding model) once in
+# the master process, so forked workers share the weights copy-on-write.
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Seconds a worker may go without a heartbeat before the arbiter kills it.
+# Handlers that block run in a threadpool, so the event loop (and heartbeat)
+# keeps running during long ingests; this is a safety net, not a request limit.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 300))
+graceful_timeout = 60
@@ -1,10 +1,14 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
+import http.cookiejar
 
 # Configuration
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:10000")
+HEALTH_CHECK_TTL = int(os.getenv("HEALTH_CHECK_TTL", 15))  # seconds
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
 
 st.set_page_config(
     page_title="Autonomous QA Agent",
@@ -68,15 +72,50 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- Backend Connection Helpers ---
+class _RejectAllCookies(http.cookiejar.DefaultCookiePolicy):
+    def set_ok(self, cookie, request):
+        return False
+
+@st.cache_resource
+def get_http_session():
+    """Returns a pooled requests.Session shared across reruns (keep-alive).
+
+    The session is shared by all browser sessions, so cookies are disabled
+    to keep one user's backend cookies from leaking to another.
+    """
+    session = requests.Session()
+    session.cookies.set_policy(_RejectAllCookies())
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=HEALTH_CHECK_TTL, show_spinner=False)
+def check_backend_health() -> bool:
+    """Pings the backend; the result is cached for HEALTH_CHECK_TTL seconds."""
+    try:
+        response = get_http_session().get(f"{BACKEND_URL}/health", timeout=1)
+        return response.ok and response.json().get("status") == "ok"
+    except (requests.exceptions.RequestException, ValueError):
+        return False
+
+backend = get_http_session()
+
 # --- Session State Initialization ---
 if 'test_cases' not in st.session_state:
     st.session_state['test_cases'] = []
+    st.session_state['test_cases_json'] = "[]"
 if 'context' not in st.session_state:
     st.session_state['context'] = []
 if 'scripts' not in st.session_state:
     st.session_state['scripts'] = {} # Key: Test_ID, Value: Script
+if 'validations' not in st.session_state:
+    st.session_state['validations'] = {} # Key: Test_ID, Value: Validation result
 if 'chat_history' not in st.session_state:
     st.session_state['chat_history'] = []
+if 'tc_page' not in st.session_state:
+    st.session_state['tc_page'] = 1
 if 'target_html' not in st.session_state:
     # Load default HTML if available
     if os.path.exists("checkout.html"):
@@ -93,10 +132,9 @@ with st.sidebar:
     # Config
     with st.expander("⚙️ Settings", expanded=False):
         llm_model = st.text_input("LLM Model", value="gemini-flash-latest", help="e.g., gemini-flash-latest, gemini-pro")
-        try:
-            requests.get(BACKEND_URL, timeout=1)
+        if check_backend_health():
             st.success("Backend: Online")
-        except:
+        else:
             st.error("Backend: Offline")
 
     st.markdown("---")
@@ -117,7 +155,7 @@ with st.sidebar:
             with st.spinner("🧠 Ingesting documents..."):
                 files = [('files', (f.name, f, f.type)) for f in uploaded_files]
                 try:
-                    response = requests.post(f"{BACKEND_URL}/ingest", files=files)
+                    response = backend.post(f"{BACKEND_URL}/ingest", files=files)
                     if response.status_code == 200:
                         st.balloons()
                         st.success("Knowledge Base Built!")
@@ -170,11 +208,14 @@ with tab1:
         with st.spinner("🕵️ Analyzing requirements..."):
             try:
                 payload = {"query": user_query, "model": llm_model}
-                response = requests.post(f"{BACKEND_URL}/generate-tests", json=payload)
+                response = backend.post(f"{BACKEND_URL}/generate-tests", json=payload)
                 
                 if response.status_code == 200:
                     data = response.json()
                     st.session_state['test_cases'] = data.get("result", [])
+                    # Serialize once here rather than on every rerun
+                    st.session_state['test_cases_json'] = json.dumps(st.session_state['test_cases'], indent=2)
+                    st.session_state['tc_page'] = 1
                     st.session_state['context'] = data.get("context", [])
                     if "warning" in data:
                         st.warning(data["warning"])
@@ -190,10 +231,23 @@ with tab1:
         st.subheader("2️⃣ Review Tests & Generate Scripts")
         
         # Global Download for Tests
-        json_str = json.dumps(st.session_state['test_cases'], indent=2)
+        json_str = st.session_state['test_cases_json']
         st.download_button("📥 Download All Tests (JSON)", json_str, "test_cases.json", "application/json")
         
-        for i, tc in enumerate(st.session_state['test_cases']):
+        # Pagination: only the current page of test cases is rendered
+        total_tests = len(st.session_state['test_cases'])
+        p1, p2 = st.columns([1, 1])
+        with p1:
+            page_size = st.selectbox("Tests per page", PAGE_SIZE_OPTIONS, key="tc_page_size")
+        total_pages = max(1, (total_tests + page_size - 1) // page_size)
+        st.session_state['tc_page'] = min(st.session_state['tc_page'], total_pages)
+        with p2:
+            page = st.number_input(f"Page (of {total_pages})", min_value=1, max_value=total_pages, key="tc_page")
+        start = (page - 1) * page_size
+        page_cases = st.session_state['test_cases'][start:start + page_size]
+        st.caption(f"Showing {start + 1}-{start + len(page_cases)} of {total_tests} test cases")
+        
+        for i, tc in enumerate(page_cases, start=start):
             tc_id = tc.get('Test_ID', f'TC-{i+1}')
             tc_title = tc.get('Test_Scenario', 'Untitled')
             
@@ -221,10 +275,11 @@ with tab1:
                                 "target_url": st.session_state.get('target_url', ""),
                                 "model": llm_model
                             }
-                            response = requests.post(f"{BACKEND_URL}/generate-script", json=payload)
+                            response = backend.post(f"{BACKEND_URL}/generate-script", json=payload)
                             if response.status_code == 200:
-                                script = response.json().get("script", "")
-                                st.session_state['scripts'][tc_id] = script
+                                data = response.json()
+                                st.session_state['scripts'][tc_id] = data.get("script", "")
+                                st.session_state['validations'][tc_id] = data.get("validation")
                             else:
                                 st.error(f"Error: {response.text}")
                         except Exception as e:
@@ -239,8 +294,15 @@ with tab1:
                         "text/x-python",
                         key=f"dl_{tc_id}"
                     )
-                    st.markdown("##### 🐍 Generated Script")
-                    st.code(st.session_state['scripts'][tc_id], language="python")
+                    validation = st.session_state['validations'].get(tc_id)
+                    if validation and not validation.get("valid", True):
+                        issues = "\n".join(f"- Line {i['line']}: {i['message']}" for i in validation.get("issues", []))
+                        st.warning(f"Pre-flight validation found issues:\n{issues}")
+                    elif validation:
+                        st.success("Pre-flight validation passed.")
+                    # Render the (potentially long) script only on demand
+                    if st.checkbox("🐍 Show Generated Script", key=f"show_{tc_id}"):
+                        st.code(st.session_state['scripts'][tc_id], language="python")
 
 # --- Tab 2: Chat Assistant ---
 with tab2:
@@ -261,7 +323,7 @@ with tab2:
             with st.spinner("Thinking..."):
                 try:
                     payload = {"query": user_input, "model": llm_model}
-                    response = requests.post(f"{BACKEND_URL}/chat", json=payload)
+                    response = backend.post(f"{BACKEND_URL}/chat", json=payload)
                     if response.status_code == 200:
                         data = response.json()
                         answer = data.get("answer", "")
@@ -1,5 +1,8 @@
 import os
 import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
 from typing import List, Optional
 from fastapi import FastAPI, UploadFile, File, HTTPException, Body
 from pydantic import BaseModel
@@ -10,7 +13,10 @@ from langchain_core.documents import Document
 import requests
 import json
 
-from src.utils import load_documents, chunk_documents
+from src.utils import load_documents, chunk_documents, SharedCacheEmbeddings
+from src.shared_state import SharedCache, CHROMA_DB_DIR, kb_write_lock, kb_read_lock, read_kb_version, bump_kb_version
+from src.retrieval import retrieve, get_retrieval_stats, RETRIEVAL_CONFIGS
+from src.validation import validate_scripts, get_dom_index, format_issues
 
 app = FastAPI(title="Autonomous QA Agent Backend")
 
@@ -37,7 +43,9 @@ else:
     print("WARNING: GEMINI_API_KEY not found in environment variables.")
 
 # Configuration
-CHROMA_DB_DIR = "chroma_db"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 50000))
+SCRIPT_FIX_ATTEMPTS = int(os.getenv("SCRIPT_FIX_ATTEMPTS", 1))
 LLM_MODEL = os.getenv("LLM_MODEL", "gemini-flash-latest")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
@@ -46,12 +54,73 @@ if GEMINI_API_KEY:
 else:
     print("WARNING: GEMINI_API_KEY not found in environment variables.")
 
-# Initialize Embeddings (using a lightweight HF model)
-embedding_function = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# Initialize Embeddings (using a lightweight HF model).
+# Loaded at import time so that `gunicorn --preload` shares the model
+# weights copy-on-write between forked workers.
+embedding_function = SharedCacheEmbeddings(
+    HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+    SharedCache("embeddings", max_entries=EMBEDDING_CACHE_SIZE),
+    EMBEDDING_MODEL
+)
 
-# Initialize Vector DB (Persistent)
-def get_vector_db():
-    return Chroma(persist_directory=CHROMA_DB_DIR, embedding_function=embedding_function)
+# Initialize Vector DB (Persistent). Each worker keeps one client per KB
+# version and reopens it when another worker has ingested a new version.
+# Chroma itself is not process-safe, so every read runs under the shared KB
+# lock and ingestion under the exclusive one.
+class _VectorDbHandle:
+    """A Chroma client for one KB version, with a count of in-flight users."""
+
+    def __init__(self, version: int):
+        self.db = Chroma(persist_directory=CHROMA_DB_DIR, embedding_function=embedding_function)
+        # Keep the System itself: once detached from chromadb's per-path
+        # cache it can no longer be reached (or released) through the client.
+        self.system = self.db._client._system
+        self.version = version
+        self.pid = os.getpid()
+        self.users = 0
+        self.retired = False
+
+    def close(self):
+        self.system.stop()
+
+_vector_db: Optional[_VectorDbHandle] = None
+_vector_db_lock = threading.Lock()
+
+def _acquire_vector_db(version: int) -> _VectorDbHandle:
+    """Returns a handle for `version`, reopening if needed. Caller must hold a KB lock."""
+    global _vector_db
+    from chromadb.api.client import SharedSystemClient
+    with _vector_db_lock:
+        if _vector_db is not None and _vector_db.pid != os.getpid():
+            # Inherited across a fork; the parent owns it
+            _vector_db = None
+        if _vector_db is None or _vector_db.version != version:
+            old = _vector_db
+            if old is not None:
+                # Detach the old System so the new client re-reads the index from disk
+                SharedSystemClient.clear_system_cache()
+                old.retired = True
+                if old.users == 0:
+                    old.close()
+            _vector_db = _VectorDbHandle(version)
+        _vector_db.users += 1
+        return _vector_db
+
+def _release_vector_db(handle: _VectorDbHandle):
+    with _vector_db_lock:
+        handle.users -= 1
+        if handle.retired and handle.users == 0:
+            handle.close()
+
+@contextmanager
+def vector_db():
+    """Yields (db, kb_version) while holding the shared KB lock, so no ingest can run underneath."""
+    with kb_read_lock():
+        handle = _acquire_vector_db(read_kb_version())
+        try:
+            yield handle.db, handle.version
+        finally:
+            _release_vector_db(handle)
 
 class TestGenRequest(BaseModel):
     query: str
@@ -62,21 +131,57 @@ class ScriptGenRequest(BaseModel):
     html_content: str
     target_url: str = "http://example.com"
     model: Optional[str] = "gemini-flash-latest"
+    run_validation: bool = True
+    auto_fix: bool = True
+
+class ScriptValidationRequest(BaseModel):
+    scripts: List[str]
+    html_content: str
+
+class RetrieveRequest(BaseModel):
+    query: str
+    endpoint: str = "chat"
 
 class ChatRequest(BaseModel):
     query: str
     model: Optional[str] = "gemini-flash-latest"
 
+# Endpoints that embed, lock or call Gemini are plain `def` so FastAPI runs
+# them in its threadpool; blocking the event loop would also stall the
+# gunicorn worker heartbeat and get the worker killed mid-request.
+@app.get("/health")
+async def health():
+    """Liveness probe; also reports which worker answered and the KB version it sees."""
+    return {"status": "ok", "pid": os.getpid(), "kb_version": read_kb_version()}
+
+@app.get("/retrieval-stats")
+def retrieval_stats():
+    """Retrieval latency and cache-hit counters, aggregated across all workers."""
+    return {
+        "stats": get_retrieval_stats(),
+        "config": {name: vars(config) for name, config in RETRIEVAL_CONFIGS.items()}
+    }
+
+@app.post("/retrieve")
+def retrieve_documents(request: RetrieveRequest):
+    """Runs retrieval only (no LLM call) with an endpoint's settings; used for debugging and benchmarks."""
+    if request.endpoint not in RETRIEVAL_CONFIGS:
+        raise HTTPException(status_code=400, detail=f"Unknown endpoint '{request.endpoint}'")
+    with vector_db() as (db, kb_version):
+        docs = retrieve(db, embedding_function, request.query, request.endpoint, kb_version)
+    return {"context": [d.metadata.get('source') for d in docs]}
+
 @app.post("/ingest")
-async def ingest_documents(files: List[UploadFile] = File(...)):
+def ingest_documents(files: List[UploadFile] = File(...)):
     """Ingests uploaded documents into the vector database."""
-    temp_dir = "temp_uploads"
-    os.makedirs(temp_dir, exist_ok=True)
+    # One directory per request: concurrent ingests run in the threadpool
+    os.makedirs("temp_uploads", exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir="temp_uploads")
     
     saved_paths = []
     try:
         for file in files:
-            file_path = os.path.join(temp_dir, file.filename)
+            file_path = os.path.join(temp_dir, os.path.basename(file.filename))
             with open(file_path, "wb") as buffer:
                 shutil.copyfileobj(file.file, buffer)
             saved_paths.append(file_path)
@@ -88,28 +193,40 @@ async def ingest_documents(files: List[UploadFile] = File(...)):
             
         chunks = chunk_documents(raw_docs)
         
-        # Add to Vector DB
-        db = get_vector_db()
-        db.add_documents(chunks)
-        db.persist()
+        # Embed before taking the lock; add_documents then hits the shared cache
+        embedding_function.embed_documents([chunk.page_content for chunk in chunks])
+        
+        # Add to Vector DB (single writer across all workers; readers wait)
+        with kb_write_lock():
+            handle = _acquire_vector_db(read_kb_version())
+            try:
+                handle.db.add_documents(chunks)
+                handle.db.persist()
+                kb_version = bump_kb_version()
+                with _vector_db_lock:
+                    # This client already holds the new data
+                    handle.version = kb_version
+            finally:
+                _release_vector_db(handle)
         
-        return {"message": f"Successfully ingested {len(files)} files. Created {len(chunks)} chunks."}
+        return {
+            "message": f"Successfully ingested {len(files)} files. Created {len(chunks)} chunks.",
+            "kb_version": kb_version
+        }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         # Cleanup temp files
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
 @app.post("/generate-tests")
-async def generate_tests(request: TestGenRequest):
+def generate_tests(request: TestGenRequest):
     """Generates test cases based on the query and knowledge base."""
     try:
-        db = get_vector_db()
         # Retrieve relevant docs
-        retriever = db.as_retriever(search_kwargs={"k": 5})
-        docs = retriever.invoke(request.query)
+        with vector_db() as (db, kb_version):
+            docs = retrieve(db, embedding_function, request.query, "generate-tests", kb_version)
         context = "\n\n".join([f"Source: {d.metadata['source']}\nContent: {d.page_content}" for d in docs])
         
         prompt = f"""
@@ -181,14 +298,58 @@ async def generate_tests(request: TestGenRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def retrieval_query_for(test_case: str) -> str:
+    """Returns the test case's Feature if it is a JSON test case, else the raw text."""
+    try:
+        parsed = json.loads(test_case)
+    except json.JSONDecodeError:
+        return test_case
+    if isinstance(parsed, dict) and parsed.get("Feature"):
+        return str(parsed["Feature"])
+    return test_case
+
+def extract_script(text: str) -> str:
+    """Extracts Python code from a markdown code block if present."""
+    import re
+    code_block_pattern = r"```(?:python|Python)?\n(.*?)```"
+    match = re.search(code_block_pattern, text, re.DOTALL)
+    if match:
+        return match.group(1).strip()
+    return text
+
+def build_fix_prompt(script: str, issues: List[dict], html_content: str) -> str:
+    """Builds a targeted regeneration prompt from validation issues."""
+    dom = get_dom_index(html_content)
+    return f"""
+        You are an expert Selenium Python Automation Engineer.
+        
+        The following Selenium Python script failed static validation.
+        
+        Script:
+        {script}
+        
+        Problems found:
+        {format_issues(issues)}
+        
+        Element IDs available in the target HTML: {", ".join(sorted(dom.ids))}
+        Element names available in the target HTML: {", ".join(sorted(dom.names))}
+        
+        Instructions:
+        1. Fix ONLY the listed problems; keep the rest of the script unchanged.
+        2. Use Selenium 4 APIs (driver.find_element(By.ID, ...)), not find_element_by_*.
+        3. Only use locators that exist in the target HTML.
+        4. Output ONLY the Python code. No markdown formatting.
+        """
+
 @app.post("/generate-script")
-async def generate_script(request: ScriptGenRequest):
+def generate_script(request: ScriptGenRequest):
     """Generates a Selenium script for a specific test case."""
     try:
-        db = get_vector_db()
-        # Retrieve relevant docs (might be useful for specific rules)
-        retriever = db.as_retriever(search_kwargs={"k": 3})
-        docs = retriever.invoke(request.test_case)
+        # Retrieve relevant docs (might be useful for specific rules).
+        # Test cases of one suite share their feature context, so query by
+        # feature to reuse the cached retrieval across the suite.
+        with vector_db() as (db, kb_version):
+            docs = retrieve(db, embedding_function, retrieval_query_for(request.test_case), "generate-script", kb_version)
         context = "\n\n".join([f"Source: {d.metadata['source']}\nContent: {d.page_content}" for d in docs])
         
         prompt = f"""
@@ -219,39 +380,65 @@ async def generate_script(request: ScriptGenRequest):
         try:
             model = genai.GenerativeModel(request.model)
             response = model.generate_content(prompt)
-            script = response.text
-            
-            # Clean up script (extract from markdown code blocks if present)
-            import re
-            code_block_pattern = r"```(python|Python)\n(.*?)```"
-            match = re.search(code_block_pattern, script, re.DOTALL)
-            if match:
-                script = match.group(1).strip()
-            else:
-                # Fallback: try generic code block
-                code_block_pattern_generic = r"```\n(.*?)```"
-                match_generic = re.search(code_block_pattern_generic, script, re.DOTALL)
-                if match_generic:
-                    script = match_generic.group(1).strip()
-            
-            return {"script": script}
+            script = extract_script(response.text)
         except Exception as e:
             print(f"Gemini API Error: {e}")
             return {
                 "script": "# LLM not reachable. Mock script.\nfrom selenium import webdriver\n\nprint('Mock script for: " + request.test_case[:20] + "...')",
                 "warning": "LLM was not reachable."
             }
+        
+        if not request.run_validation:
+            return {"script": script}
+        
+        # Pre-flight static validation against the target HTML
+        try:
+            validation = validate_scripts([script], request.html_content)[0]
+        except Exception as e:
+            print(f"Script validation error: {e}")
+            return {"script": script, "validation": None, "warning": f"Script validation failed: {e}"}
+        
+        attempts = 0
+        while not validation["valid"] and request.auto_fix and attempts < SCRIPT_FIX_ATTEMPTS:
+            attempts += 1
+            print(f"Script failed validation, regenerating (attempt {attempts}):\n{format_issues(validation['issues'])}")
+            try:
+                response = model.generate_content(build_fix_prompt(script, validation["issues"], request.html_content))
+                fixed_script = extract_script(response.text)
+                fixed_validation = validate_scripts([fixed_script], request.html_content)[0]
+            except Exception as e:
+                # Keep the last good script rather than falling back to the mock
+                print(f"Script fix attempt {attempts} failed: {e}")
+                return {
+                    "script": script,
+                    "validation": validation,
+                    "fix_attempts": attempts,
+                    "warning": f"Automatic fix failed: {e}"
+                }
+            # Only keep the regenerated script if it is actually better
+            if fixed_validation["valid"] or len(fixed_validation["issues"]) < len(validation["issues"]):
+                script, validation = fixed_script, fixed_validation
+        
+        return {"script": script, "validation": validation, "fix_attempts": attempts}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/validate-scripts")
+def validate_scripts_endpoint(request: ScriptValidationRequest):
+    """Statically validates a batch of Selenium scripts against the target HTML."""
+    try:
+        results = validate_scripts(request.scripts, request.html_content)
+        return {"results": [{"script": script, "validation": result} for script, result in zip(request.scripts, results)]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/chat")
-async def chat_with_docs(request: ChatRequest):
+def chat_with_docs(request: ChatRequest):
     """Chat with the knowledge base."""
     try:
-        db = get_vector_db()
-        retriever = db.as_retriever(search_kwargs={"k": 5})
-        docs = retriever.invoke(request.query)
+        with vector_db() as (db, kb_version):
+            docs = retrieve(db, embedding_function, request.query, "chat", kb_version)
         context = "\n\n".join([f"Source: {d.metadata['source']}\nContent: {d.page_content}" for d in docs])
         
         prompt = f"""
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+from typing import List, Dict
+import numpy as np
+from langchain_core.documents import Document
+
+from src.shared_state import SharedCache, SharedCounters
+
+
+class RetrievalConfig:
+    """Per-endpoint retrieval settings, overridable via RETRIEVAL_<ENDPOINT>_<FIELD> env vars."""
+
+    def __init__(self, name: str, k: int, fetch_k: int, lambda_mult: float, use_mmr: bool = True):
+        prefix = f"RETRIEVAL_{name.upper().replace('-', '_')}_"
+        self.name = name
+        self.k = int(os.getenv(prefix + "K", k))
+        self.fetch_k = max(self.k, int(os.getenv(prefix + "FETCH_K", fetch_k)))
+        # 1.0 = pure relevance, 0.0 = maximum diversity
+        self.lambda_mult = float(os.getenv(prefix + "LAMBDA", lambda_mult))
+        self.use_mmr = os.getenv(prefix + "MMR", str(use_mmr)).lower() in ("1", "true", "yes")
+
+    def cache_tag(self) -> str:
+        return f"{self.k}:{self.fetch_k}:{self.lambda_mult}:{self.use_mmr}"
+
+
+RETRIEVAL_CONFIGS = {
+    "generate-tests": RetrievalConfig("generate-tests", k=5, fetch_k=20, lambda_mult=0.5),
+    "generate-script": RetrievalConfig("generate-script", k=3, fetch_k=12, lambda_mult=0.7),
+    "chat": RetrievalConfig("chat", k=5, fetch_k=20, lambda_mult=0.6),
+}
+
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 2000))
+
+_retrieval_cache = SharedCache("retrieval", max_entries=RETRIEVAL_CACHE_SIZE)
+_stats = SharedCounters("retrieval")
+
+
+def maximal_marginal_relevance(query_embedding: np.ndarray, candidate_embeddings: np.ndarray,
+                               k: int, lambda_mult: float) -> List[int]:
+    """Greedy MMR selection; returns indices into candidate_embeddings."""
+    if len(candidate_embeddings) == 0 or k <= 0:
+        return []
+    candidates = candidate_embeddings / (np.linalg.norm(candidate_embeddings, axis=1, keepdims=True) + 1e-10)
+    query = query_embedding / (np.linalg.norm(query_embedding) + 1e-10)
+    relevance = candidates @ query
+    pairwise = candidates @ candidates.T
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of each candidate to anything already selected
+    redundancy = pairwise[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(k, len(candidates)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return selected
+
+
+def _record(endpoint: str, hit: bool, latency: float):
+    _stats.add(endpoint, "requests")
+    _stats.add(endpoint, "cache_hits", int(hit))
+    _stats.add(endpoint, "total_latency_ms", latency * 1000)
+
+
+def get_retrieval_stats() -> Dict[str, Dict[str, float]]:
+    """Returns per-endpoint request, cache-hit and latency counters across all workers."""
+    return {
+        endpoint: {
+            **stats,
+            "hit_rate": stats.get("cache_hits", 0) / stats["requests"],
+            "avg_latency_ms": stats.get("total_latency_ms", 0) / stats["requests"],
+        }
+        for endpoint, stats in _stats.totals().items()
+        if stats.get("requests")
+    }
+
+
+def _search(db, query_embedding: List[float], config: RetrievalConfig) -> List[Document]:
+    """Runs the vector search, reranking a larger candidate pool with MMR if enabled."""
+    if not config.use_mmr:
+        return db.similarity_search_by_vector(query_embedding, k=config.k)
+
+    # The public max_marginal_relevance_search_by_vector neither returns nor
+    # exposes the candidate embeddings and uses LangChain's own MMR, so query
+    # the underlying collection directly for the candidate pool.
+    result = db._collection.query(
+        query_embeddings=[query_embedding],
+        n_results=config.fetch_k,
+        include=["documents", "metadatas", "embeddings"]
+    )
+    texts = result["documents"][0]
+    metadatas = result["metadatas"][0]
+    if not texts:
+        return []
+    if len(texts) > config.k:
+        order = maximal_marginal_relevance(
+            np.asarray(query_embedding, dtype=np.float32),
+            np.asarray(result["embeddings"][0], dtype=np.float32),
+            config.k,
+            config.lambda_mult
+        )
+    else:
+        order = range(len(texts))
+    return [Document(page_content=texts[i], metadata=metadatas[i] or {}) for i in order]
+
+
+def retrieve(db, embedding_function, query: str, endpoint: str, kb_version: int) -> List[Document]:
+    """Retrieves documents for an endpoint, memoized by query embedding and KB version.
+
+    `kb_version` must be the version `db` was opened at, so results from an
+    older index are never cached under a newer version.
+    """
+    start = time.perf_counter()
+    config = RETRIEVAL_CONFIGS[endpoint]
+    query_embedding = embedding_function.embed_query(query)
+
+    key_source = np.asarray(query_embedding, dtype=np.float32).tobytes()
+    key = hashlib.sha256(key_source + f"|{kb_version}|{config.cache_tag()}".encode("utf-8")).hexdigest()
+    cached = _retrieval_cache.get(key)
+    if cached is not None:
+        docs = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in json.loads(cached)]
+        _record(endpoint, True, time.perf_counter() - start)
+        return docs
+
+    docs = _search(db, query_embedding, config)
+    _retrieval_cache.set(key, json.dumps([{"page_content": d.page_content, "metadata": d.metadata} for d in docs]).encode("utf-8"))
+    _record(endpoint, False, time.perf_counter() - start)
+    return docs
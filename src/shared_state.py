@@ -0,0 +1,230 @@
+import os
+import time
+import sqlite3
+import fcntl
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# State shared between backend worker processes. Everything here is opened
+# lazily and per process, so it is safe to import before workers are forked.
+CHROMA_DB_DIR = os.getenv("CHROMA_DB_DIR", "chroma_db")
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join("cache", "shared_cache.sqlite3"))
+KB_VERSION_FILE = os.path.join(CHROMA_DB_DIR, "kb_version")
+KB_WRITE_LOCK_FILE = os.path.join(CHROMA_DB_DIR, ".kb_write.lock")
+
+# Stays below SQLite's bound-parameter limit
+_SQLITE_BATCH = 500
+
+
+@contextmanager
+def _kb_lock(mode: int):
+    os.makedirs(CHROMA_DB_DIR, exist_ok=True)
+    with open(KB_WRITE_LOCK_FILE, "a") as lock_file:
+        fcntl.flock(lock_file, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def kb_write_lock():
+    """Exclusive, cross-process lock held while writing to the vector DB.
+
+    Blocks the calling thread, so only call it from sync (threadpool) code.
+    """
+    return _kb_lock(fcntl.LOCK_EX)
+
+
+def kb_read_lock():
+    """Shared lock held while opening or querying the vector DB; excludes kb_write_lock()."""
+    return _kb_lock(fcntl.LOCK_SH)
+
+
+def read_kb_version() -> int:
+    """Returns the current knowledge base version (0 if never ingested)."""
+    try:
+        with open(KB_VERSION_FILE, "r") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_kb_version() -> int:
+    """Increments the KB version. Must be called while holding kb_write_lock()."""
+    version = read_kb_version() + 1
+    tmp_path = f"{KB_VERSION_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, KB_VERSION_FILE)
+    return version
+
+
+_local = threading.local()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """Returns this thread's connection to the shared store, reopened after a fork."""
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.pid != os.getpid():
+        # SQLite connections must not cross a fork
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, accessed REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, field TEXT NOT NULL, value REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key, field))"
+        )
+        conns[path] = conn
+    return conn
+
+
+class SharedCache:
+    """A SQLite-backed key/value cache with approximate LRU eviction, shared by all workers.
+
+    Reads stay read-only in the common case: the access time of an entry is
+    only refreshed once it is older than `touch_interval` seconds, and the
+    entry count is only checked against the cap every `evict_every` inserts.
+    """
+
+    def __init__(self, namespace: str, max_entries: int = 10000, path: str = SHARED_CACHE_PATH,
+                 touch_interval: float = 60.0, evict_every: Optional[int] = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.path = path
+        self.touch_interval = touch_interval
+        self.evict_every = evict_every or max(1, min(1000, max_entries // 100))
+        self._inserts_lock = threading.Lock()
+        self._inserts_since_check = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        return _connect(self.path)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        conn = self._connection()
+        found = {}
+        stale = []
+        now = time.time()
+        for i in range(0, len(keys), _SQLITE_BATCH):
+            batch = keys[i:i + _SQLITE_BATCH]
+            rows = conn.execute(
+                f"SELECT key, value, accessed FROM cache WHERE namespace = ? AND key IN ({','.join('?' * len(batch))})",
+                (self.namespace, *batch)
+            ).fetchall()
+            for key, value, accessed in rows:
+                found[key] = value
+                if now - accessed > self.touch_interval:
+                    stale.append((now, self.namespace, key))
+        if stale:
+            conn.executemany("UPDATE cache SET accessed = ? WHERE namespace = ? AND key = ?", stale)
+        return [found.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes):
+        self.set_many([(key, value)])
+
+    def set_many(self, items: List[Tuple[str, bytes]]):
+        """Inserts all items in a single transaction."""
+        if not items:
+            return
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, accessed) VALUES (?, ?, ?, ?)",
+                [(self.namespace, key, value, now) for key, value in items]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._inserts_lock:
+            self._inserts_since_check += len(items)
+            check = self._inserts_since_check >= self.evict_every
+            if check:
+                self._inserts_since_check = 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Drops the least recently used entries beyond the cap."""
+        conn = self._connection()
+        count = conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY accessed ASC LIMIT ?)",
+                (self.namespace, self.namespace, excess)
+            )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+
+class SharedCounters:
+    """Counters aggregated across all workers in the shared store.
+
+    Increments are buffered per process and flushed at most every
+    `flush_interval` seconds, so totals may lag other workers by that much.
+    """
+
+    def __init__(self, namespace: str, path: str = SHARED_CACHE_PATH, flush_interval: float = 5.0):
+        self.namespace = namespace
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], float] = {}
+        self._last_flush = time.time()
+
+    def add(self, key: str, field: str, amount: float = 1):
+        with self._lock:
+            self._pending[(key, field)] = self._pending.get((key, field), 0) + amount
+            due = time.time() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time()
+        if not pending:
+            return
+        conn = _connect(self.path)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO counters (namespace, key, field, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key, field) DO UPDATE SET value = value + excluded.value",
+                [(self.namespace, key, field, amount) for (key, field), amount in pending.items()]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Flushes this process's pending increments and returns the deployment-wide totals."""
+        self.flush()
+        totals: Dict[str, Dict[str, float]] = {}
+        rows = _connect(self.path).execute(
+            "SELECT key, field, value FROM counters WHERE namespace = ?", (self.namespace,)
+        ).fetchall()
+        for key, field, value in rows:
+            totals.setdefault(key, {})[field] = value
+        return totals
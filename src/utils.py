@@ -1,9 +1,14 @@
 import os
+import hashlib
+from array import array
 from typing import List, Dict
 import fitz  # PyMuPDF
 from bs4 import BeautifulSoup
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.shared_state import SharedCache
 
 def parse_pdf(file_path: str) -> str:
     """Extracts text from a PDF file."""
@@ -55,3 +60,34 @@ def chunk_documents(documents: List[Document], chunk_size: int = 1000, chunk_ove
         chunk_overlap=chunk_overlap
     )
     return text_splitter.split_documents(documents)
+
+class SharedCacheEmbeddings(Embeddings):
+    """Wraps an embedding model with a cache shared across worker processes."""
+
+    def __init__(self, underlying: Embeddings, cache: SharedCache, model_name: str):
+        self.underlying = underlying
+        self.cache = cache
+        self.model_name = model_name
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        if missing:
+            computed = self.underlying.embed_documents([texts[i] for i in missing])
+            self.cache.set_many([(keys[i], array("d", vec).tobytes()) for i, vec in zip(missing, computed)])
+            for i, vec in zip(missing, computed):
+                vectors[i] = vec
+        return [list(array("d", vec)) if isinstance(vec, bytes) else vec for vec in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return list(array("d", cached))
+        vec = self.underlying.embed_query(text)
+        self.cache.set(key, array("d", vec).tobytes())
+        return vec
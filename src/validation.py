@@ -0,0 +1,177 @@
+import ast
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Dict, Optional
+from bs4 import BeautifulSoup
+
+# Selenium 4 removed the find_element(s)_by_* helpers
+DEPRECATED_SELENIUM_APIS = {
+    f"find_{kind}_by_{strategy}": f"find_{kind}(By.{strategy.upper()}, ...)"
+    for kind in ("element", "elements")
+    for strategy in ("id", "name", "xpath", "css_selector", "class_name",
+                     "tag_name", "link_text", "partial_link_text")
+}
+
+# Locator strategies that can be checked statically against the HTML
+CHECKED_LOCATORS = {"ID", "NAME", "CSS_SELECTOR"}
+
+DOM_INDEX_CACHE_SIZE = 32
+MIN_PARALLEL_BATCH = 4
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", min(4, os.cpu_count() or 1)))
+
+_dom_index_cache: "OrderedDict[str, DomIndex]" = OrderedDict()
+_dom_index_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class DomIndex:
+    """Lookup tables for the elements of a parsed HTML page."""
+
+    def __init__(self, html_content: str):
+        self.soup = BeautifulSoup(html_content, 'html.parser')
+        self.ids = {el['id'] for el in self.soup.find_all(id=True)}
+        self.names = {el['name'] for el in self.soup.find_all(attrs={"name": True})}
+        self._selector_cache: Dict[str, bool] = {}
+
+    def has(self, strategy: str, value: str) -> bool:
+        if strategy == "ID":
+            return value in self.ids
+        if strategy == "NAME":
+            return value in self.names
+        if value not in self._selector_cache:
+            try:
+                self._selector_cache[value] = self.soup.select_one(value) is not None
+            except Exception:
+                # Selector syntax soupsieve can't handle; don't flag it
+                self._selector_cache[value] = True
+        return self._selector_cache[value]
+
+
+def get_dom_index(html_content: str) -> DomIndex:
+    """Returns the DOM index for the HTML, cached by content hash."""
+    key = hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+    with _dom_index_lock:
+        index = _dom_index_cache.get(key)
+        if index is not None:
+            _dom_index_cache.move_to_end(key)
+            return index
+    # Parse outside the lock; a concurrent parse of the same page is harmless
+    index = DomIndex(html_content)
+    with _dom_index_lock:
+        _dom_index_cache[key] = index
+        _dom_index_cache.move_to_end(key)
+        while len(_dom_index_cache) > DOM_INDEX_CACHE_SIZE:
+            _dom_index_cache.popitem(last=False)
+    return index
+
+
+def _locator_strategy(node: ast.AST) -> Optional[str]:
+    """Returns 'ID' for a `By.ID` node, etc."""
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "By":
+        return node.attr
+    return None
+
+
+def _string_value(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def _find_locators(tree: ast.AST) -> List[Dict]:
+    """Collects (By.X, "value") pairs from tuples and call arguments, positional or by=/value=."""
+    locators = []
+
+    def add(strategy_node: ast.AST, value_node: ast.AST):
+        strategy = _locator_strategy(strategy_node)
+        value = _string_value(value_node)
+        if strategy in CHECKED_LOCATORS and value is not None:
+            locators.append({"strategy": strategy, "value": value, "line": strategy_node.lineno})
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Tuple):
+            items = node.elts
+        elif isinstance(node, ast.Call):
+            items = node.args
+            keywords = {kw.arg: kw.value for kw in node.keywords if kw.arg}
+            if "by" in keywords and "value" in keywords:
+                add(keywords["by"], keywords["value"])
+            elif "value" in keywords and len(items) == 1:
+                add(items[0], keywords["value"])
+        else:
+            continue
+        for first, second in zip(items, items[1:]):
+            add(first, second)
+    return locators
+
+
+def validate_script(script: str, html_content: str) -> Dict:
+    """Statically checks a Selenium script for syntax errors, deprecated APIs and unknown locators."""
+    issues = []
+    try:
+        tree = ast.parse(script)
+    except SyntaxError as e:
+        return {
+            "valid": False,
+            "issues": [{"type": "syntax_error", "line": e.lineno, "message": f"Syntax error: {e.msg}"}]
+        }
+
+    locators = _find_locators(tree)
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr in DEPRECATED_SELENIUM_APIS):
+            issues.append({
+                "type": "deprecated_api",
+                "line": node.lineno,
+                "message": f"'{node.func.attr}' was removed in Selenium 4; use "
+                           f"'{DEPRECATED_SELENIUM_APIS[node.func.attr]}' instead."
+            })
+            # The legacy helpers still name a locator worth checking
+            strategy = node.func.attr.split("_by_", 1)[1].upper()
+            value = _string_value(node.args[0]) if node.args else None
+            if strategy in CHECKED_LOCATORS and value is not None:
+                locators.append({"strategy": strategy, "value": value, "line": node.lineno})
+
+    if locators and html_content:
+        dom = get_dom_index(html_content)
+        for loc in locators:
+            if not dom.has(loc["strategy"], loc["value"]):
+                issues.append({
+                    "type": "missing_locator",
+                    "line": loc["line"],
+                    "message": f"No element matches By.{loc['strategy']} '{loc['value']}' in the target HTML."
+                })
+
+    issues.sort(key=lambda issue: issue["line"] or 0)
+    return {"valid": not issues, "issues": issues}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Forking a multi-threaded backend worker with torch loaded is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=VALIDATION_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+        return _executor
+
+
+def validate_scripts(scripts: List[str], html_content: str) -> List[Dict]:
+    """Validates a batch of scripts, fanning out to a process pool for larger batches."""
+    if len(scripts) < MIN_PARALLEL_BATCH or VALIDATION_WORKERS <= 1:
+        return [validate_script(script, html_content) for script in scripts]
+    chunksize = max(1, len(scripts) // (VALIDATION_WORKERS * 4))
+    return list(_get_executor().map(validate_script, scripts, repeat(html_content), chunksize=chunksize))
+
+
+def format_issues(issues: List[Dict]) -> str:
+    """Renders validation issues as a bullet list for prompts and logs."""
+    return "\n".join(f"- Line {issue['line']}: {issue['message']}" for issue in issues)
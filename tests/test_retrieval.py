@@ -0,0 +1,73 @@
+from langchain_core.documents import Document
+import numpy as np
+
+from src import retrieval
+from src.retrieval import RetrievalConfig, maximal_marginal_relevance, retrieve
+from src.shared_state import SharedCache, SharedCounters
+
+
+def test_mmr_picks_most_relevant_first_then_diversifies():
+    query = np.array([1.0, 0.0])
+    candidates = np.array([
+        [1.0, 0.0],    # most relevant
+        [0.99, 0.14],  # near-duplicate of the first
+        [0.6, 0.8],    # less relevant but different
+    ])
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.3) == [0, 2]
+
+
+def test_mmr_lambda_one_is_plain_relevance_order():
+    query = np.array([1.0, 0.0])
+    candidates = np.array([[0.6, 0.8], [1.0, 0.0], [0.99, 0.14]])
+    assert maximal_marginal_relevance(query, candidates, k=3, lambda_mult=1.0) == [1, 2, 0]
+
+
+def test_mmr_lambda_zero_maximizes_diversity():
+    query = np.array([1.0, 0.0])
+    candidates = np.array([[1.0, 0.0], [0.99, 0.14], [0.0, 1.0]])
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.0) == [0, 2]
+
+
+def test_mmr_k_larger_than_candidates_returns_each_once():
+    query = np.array([1.0, 0.0])
+    candidates = np.array([[1.0, 0.0], [0.0, 1.0]])
+    assert sorted(maximal_marginal_relevance(query, candidates, k=5, lambda_mult=0.5)) == [0, 1]
+
+
+def test_mmr_empty_candidates():
+    assert maximal_marginal_relevance(np.array([1.0, 0.0]), np.empty((0, 2)), k=3, lambda_mult=0.5) == []
+
+
+class _FakeEmbeddings:
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+class _FakeDb:
+    def __init__(self, source):
+        self.source = source
+        self.searches = 0
+
+    def similarity_search_by_vector(self, embedding, k):
+        self.searches += 1
+        return [Document(page_content="chunk", metadata={"source": self.source})]
+
+
+def _isolate_retrieval(monkeypatch, tmp_path):
+    monkeypatch.setattr(retrieval, "_retrieval_cache", SharedCache("retrieval", path=str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(retrieval, "_stats", SharedCounters("retrieval", path=str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setitem(retrieval.RETRIEVAL_CONFIGS, "test", RetrievalConfig("test", k=1, fetch_k=1, lambda_mult=1.0, use_mmr=False))
+
+
+def test_retrieve_caches_per_kb_version(monkeypatch, tmp_path):
+    _isolate_retrieval(monkeypatch, tmp_path)
+    old_db, new_db = _FakeDb("old.md"), _FakeDb("new.md")
+
+    assert retrieve(old_db, _FakeEmbeddings(), "query", "test", kb_version=1)[0].metadata["source"] == "old.md"
+    assert retrieve(old_db, _FakeEmbeddings(), "query", "test", kb_version=1)[0].metadata["source"] == "old.md"
+    assert old_db.searches == 1
+
+    # A newer version never sees results cached for the older index
+    assert retrieve(new_db, _FakeEmbeddings(), "query", "test", kb_version=2)[0].metadata["source"] == "new.md"
+    assert new_db.searches == 1
+    assert retrieval.get_retrieval_stats()["test"]["cache_hits"] == 1
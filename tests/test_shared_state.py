@@ -0,0 +1,68 @@
+import threading
+import time
+
+from src import shared_state
+from src.shared_state import SharedCache, SharedCounters
+
+
+def test_shared_cache_round_trip(tmp_path):
+    cache = SharedCache("test", path=str(tmp_path / "cache.sqlite3"))
+    cache.set_many([("a", b"1"), ("b", b"2")])
+    assert cache.get("a") == b"1"
+    assert cache.get_many(["b", "missing", "a"]) == [b"2", None, b"1"]
+
+
+def test_shared_cache_evicts_least_recently_used(tmp_path):
+    cache = SharedCache("test", max_entries=3, path=str(tmp_path / "cache.sqlite3"),
+                        touch_interval=0, evict_every=1)
+    for key in "abcd":
+        cache.set(key, key.encode())
+        time.sleep(0.01)
+    assert cache.get("a") is None
+    # Touch "b" so that "c" becomes the least recently used entry
+    assert cache.get("b") == b"b"
+    time.sleep(0.01)
+    cache.set("e", b"e")
+    assert cache.get_many(list("bcde")) == [b"b", None, b"d", b"e"]
+
+
+def test_shared_cache_namespaces_are_isolated(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SharedCache("one", path=path).set("k", b"1")
+    assert SharedCache("two", path=path).get("k") is None
+
+
+def test_kb_write_lock_excludes_readers(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_state, "CHROMA_DB_DIR", str(tmp_path))
+    monkeypatch.setattr(shared_state, "KB_WRITE_LOCK_FILE", str(tmp_path / ".kb_write.lock"))
+    acquired = threading.Event()
+
+    def reader():
+        with shared_state.kb_read_lock():
+            acquired.set()
+
+    with shared_state.kb_write_lock():
+        thread = threading.Thread(target=reader)
+        thread.start()
+        assert not acquired.wait(0.2)
+    assert acquired.wait(5)
+    thread.join()
+
+
+def test_bump_kb_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_state, "KB_VERSION_FILE", str(tmp_path / "kb_version"))
+    assert shared_state.read_kb_version() == 0
+    assert shared_state.bump_kb_version() == 1
+    assert shared_state.bump_kb_version() == 2
+    assert shared_state.read_kb_version() == 2
+
+
+def test_shared_counters_aggregate_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = SharedCounters("stats", path=path)
+    second = SharedCounters("stats", path=path)
+    first.add("chat", "requests", 2)
+    second.add("chat", "requests")
+    second.add("chat", "cache_hits")
+    first.flush()
+    assert second.totals() == {"chat": {"requests": 3, "cache_hits": 1}}
@@ -0,0 +1,74 @@
+import ast
+
+from src.validation import validate_script, _find_locators
+
+HTML = """
+<form id="checkoutForm">
+    <input type="text" id="discountCode" name="discount">
+    <button id="applyDiscount" class="btn primary">Apply</button>
+    <span id="discountMessage"></span>
+</form>
+"""
+
+
+def test_find_locators_from_tuples_and_calls():
+    script = (
+        "WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.ID, 'discountCode')))\n"
+        "driver.find_element(By.CSS_SELECTOR, '#discountMessage')\n"
+        "driver.find_element(By.XPATH, '//button')\n"
+    )
+    locators = _find_locators(ast.parse(script))
+    assert {(loc["strategy"], loc["value"], loc["line"]) for loc in locators} == {
+        ("ID", "discountCode", 1),
+        ("CSS_SELECTOR", "#discountMessage", 2),
+    }
+
+
+def test_find_locators_from_keyword_arguments():
+    script = (
+        "driver.find_element(by=By.ID, value='discountCode')\n"
+        "driver.find_element(By.NAME, value='discount')\n"
+        "driver.find_element(value='#discountMessage', by=By.CSS_SELECTOR)\n"
+    )
+    locators = _find_locators(ast.parse(script))
+    assert {(loc["strategy"], loc["value"], loc["line"]) for loc in locators} == {
+        ("ID", "discountCode", 1),
+        ("NAME", "discount", 2),
+        ("CSS_SELECTOR", "#discountMessage", 3),
+    }
+
+
+def test_validate_script_flags_missing_keyword_locator():
+    result = validate_script("driver.find_element(by=By.ID, value='missing')\n", HTML)
+    assert [(issue["type"], issue["line"]) for issue in result["issues"]] == [("missing_locator", 1)]
+
+
+def test_validate_script_valid():
+    script = (
+        "driver.find_element(By.ID, 'discountCode')\n"
+        "driver.find_element(By.NAME, 'discount')\n"
+        "driver.find_element(By.CSS_SELECTOR, 'button.btn.primary')\n"
+    )
+    assert validate_script(script, HTML) == {"valid": True, "issues": []}
+
+
+def test_validate_script_flags_deprecated_api_and_missing_locators():
+    script = (
+        "driver.find_element_by_id('applyDiscount')\n"
+        "driver.find_element_by_id('missingButton')\n"
+        "driver.find_element(By.CSS_SELECTOR, '#nope')\n"
+    )
+    result = validate_script(script, HTML)
+    assert not result["valid"]
+    assert [(issue["type"], issue["line"]) for issue in result["issues"]] == [
+        ("deprecated_api", 1),
+        ("deprecated_api", 2),
+        ("missing_locator", 2),
+        ("missing_locator", 3),
+    ]
+
+
+def test_validate_script_syntax_error():
+    result = validate_script("driver.get(", HTML)
+    assert not result["valid"]
+    assert result["issues"][0]["type"] == "syntax_error"